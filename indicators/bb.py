@@ -0,0 +1,85 @@
+from typing import Tuple
+
+import numpy as np
+
+from utils._njit import njit
+
+
+# error_model="numpy": a flat window divides by zero into inf/NaN like pandas, instead of raising
+@njit(cache=True, nogil=True, error_model="numpy")
+def bollinger_fused(
+    high: np.ndarray,
+    low: np.ndarray,
+    close: np.ndarray,
+    n: int = 20,
+    k: float = 2.0,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Bollinger Bands of the typical price `(high + low + close) / 3` in a single pass.
+
+    Same results as `qtpylib.bollinger_bands(qtpylib.typical_price(dataframe), n, k)`:
+    the first `n - 1` values use the partial window, the standard deviation is the
+    sample one (ddof=1) and NaN values are skipped. The running mean and sum of squared
+    deviations are updated Welford-style, one add and one remove per step, which unlike
+    `sum(x**2) / n - mean**2` doesn't lose precision on large prices.
+
+    Parameters:
+    ----------
+    high, low, close : np.ndarray
+        The price arrays, all of the same length.
+    n : int
+        The rolling window length (default is 20).
+    k : float
+        The number of standard deviations of the bands (default is 2.0).
+
+    Returns:
+    -------
+    tuple of np.ndarray
+        The float64 (mid, upper, lower, bb_percent, bb_width) arrays.
+    """
+    size = close.shape[0]
+    mid = np.full(size, np.nan)
+    upper = np.full(size, np.nan)
+    lower = np.full(size, np.nan)
+    bb_percent = np.full(size, np.nan)
+    bb_width = np.full(size, np.nan)
+    typical = np.empty(size)
+
+    count = 0
+    mean = 0.0
+    m2 = 0.0
+    for i in range(size):
+        tp = (float(high[i]) + float(low[i]) + float(close[i])) / 3.0
+        typical[i] = tp
+
+        # tp enters the window
+        if not np.isnan(tp):
+            count += 1
+            delta = tp - mean
+            mean += delta / count
+            m2 += delta * (tp - mean)
+
+        # typical[i - n] leaves it
+        if i >= n and not np.isnan(typical[i - n]):
+            old = typical[i - n]
+            count -= 1
+            if count == 0:
+                mean = 0.0
+                m2 = 0.0
+            else:
+                delta = old - mean
+                mean -= delta / count
+                m2 -= delta * (old - mean)
+
+        if count == 0:
+            continue
+        mid[i] = mean
+        if count < 2:
+            continue
+        std = np.sqrt(max(m2, 0.0) / (count - 1))
+        upper[i] = mean + k * std
+        lower[i] = mean - k * std
+        bb_percent[i] = (close[i] - lower[i]) / (upper[i] - lower[i])
+        bb_width[i] = (upper[i] - lower[i]) / mean
+
+    return mid, upper, lower, bb_percent, bb_width
@@ -1,6 +1,7 @@
 from typing import Tuple
-import talib.abstract as ta
+import numpy as np
 import pandas as pd
+import talib
 
 # We can add more pattern from Talib
 patterns = [
@@ -23,6 +24,20 @@ patterns = [
     "CDLADVANCEBLOCK",
 ]
 
+# TA-Lib functions of the patterns above, resolved once at import
+_PATTERN_FUNCS = [(pattern, getattr(talib, pattern)) for pattern in patterns]
+
+
+def _ohlc_arrays(dataframe: pd.DataFrame) -> Tuple[np.ndarray, ...]:
+    """
+    Convert the OHLC columns once to the contiguous float64 arrays TA-Lib works on,
+    so the pattern functions don't have to convert them on every call.
+    """
+    return tuple(
+        np.ascontiguousarray(dataframe[column].to_numpy(dtype=np.float64))
+        for column in ("open", "high", "low", "close")
+    )
+
 
 def find_candlestick_patterns(dataframe: pd.DataFrame) -> Tuple[pd.Series, pd.Series]:
     """
@@ -41,38 +56,69 @@ def find_candlestick_patterns(dataframe: pd.DataFrame) -> Tuple[pd.Series, pd.Se
     Returns:
     --------
     Tuple[pd.Series, pd.Series]
-        - The first element is a pandas Series with a flag (1 or NaN) indicating the presence of a bullish pattern.
-        - The second element is a pandas Series with a flag (1 or NaN) indicating the presence of a bearish pattern.
+        - The first element is a pandas Series with an int8 flag (1 or 0) indicating the presence of a bullish pattern.
+        - The second element is a pandas Series with an int8 flag (1 or 0) indicating the presence of a bearish pattern.
 
     Notes:
     ------
     - For each row in the DataFrame, the function will check if any bullish or bearish candlestick pattern is detected.
     - TA-Lib pattern functions return 100 for a bullish pattern and -100 for a bearish pattern.
-    - If multiple patterns are detected for a given row, they are stored in lists within the DataFrame.
     - If any bullish or bearish pattern is detected, the corresponding flag ('bullish_candle' or 'bearish_candle') will be set to 1.
+    - Use `find_candlestick_pattern_names` to get the names of the detected patterns.
+    """
+    open_, high, low, close = _ohlc_arrays(dataframe)
+
+    # One row per pattern, the results only take the values -100, 0 and 100
+    results = np.empty((len(_PATTERN_FUNCS), len(dataframe)), dtype=np.int8)
+    for i, (_, function) in enumerate(_PATTERN_FUNCS):
+        # Call the TA-Lib functions directly on the arrays, skipping the abstract API
+        results[i] = function(open_, high, low, close)
+    bullish = (results == 100).any(axis=0)
+    bearish = (results == -100).any(axis=0)
+
+    # int8 flags, 1 byte per row instead of the 8 of float64
+    bullish_candle = pd.Series(
+        bullish.view(np.int8), index=dataframe.index, name="bullish_candle"
+    )
+    bearish_candle = pd.Series(
+        bearish.view(np.int8), index=dataframe.index, name="bearish_candle"
+    )
+    return bullish_candle, bearish_candle
+
+
+def find_candlestick_pattern_names(
+    dataframe: pd.DataFrame,
+) -> Tuple[pd.Series, pd.Series]:
     """
-    df = dataframe.copy()
-    # Initialize empty columns
-    df["bullish_pattern"] = [[] for _ in range(len(df))]
-    df["bearish_pattern"] = [[] for _ in range(len(df))]
-
-    # Loop through each pattern function
-    for pattern in patterns:
-        # Get the function from TA-Lib
-        pattern_function = getattr(ta, pattern)
-
-        # Apply the function to the df
-        result = pattern_function(df["open"], df["high"], df["low"], df["close"])
-
-        # Add the pattern name to the appropriate list in each row
-        df.loc[result == 100, "bullish_pattern"] = df.loc[
-            result == 100, "bullish_pattern"
-        ].apply(lambda x: x + [pattern])
-        df.loc[result == -100, "bearish_pattern"] = df.loc[
-            result == -100, "bearish_pattern"
-        ].apply(lambda x: x + [pattern])
-
-    df.loc[df["bullish_pattern"].apply(lambda x: len(x) > 0), "bullish_candle"] = 1
-    df.loc[df["bearish_pattern"].apply(lambda x: len(x) > 0), "bearish_candle"] = 1
-
-    return df["bullish_candle"], df["bearish_candle"]
+    Same detection as `find_candlestick_patterns`, but returns the names of the detected patterns
+    instead of a flag. This is slower, use it only when the pattern names are needed.
+
+    Parameters:
+    -----------
+    dataframe: pd.DataFrame
+        The input DataFrame should contain the 'open', 'high', 'low' and 'close' columns.
+
+    Returns:
+    --------
+    Tuple[pd.Series, pd.Series]
+        - The first element is a pandas Series with the list of bullish patterns detected for each row.
+        - The second element is a pandas Series with the list of bearish patterns detected for each row.
+    """
+    bullish_pattern = [[] for _ in range(len(dataframe))]
+    bearish_pattern = [[] for _ in range(len(dataframe))]
+
+    open_, high, low, close = _ohlc_arrays(dataframe)
+
+    for pattern, function in _PATTERN_FUNCS:
+        result = function(open_, high, low, close)
+
+        # Only visit the rows where the pattern was detected
+        for i in np.flatnonzero(result == 100):
+            bullish_pattern[i].append(pattern)
+        for i in np.flatnonzero(result == -100):
+            bearish_pattern[i].append(pattern)
+
+    return (
+        pd.Series(bullish_pattern, index=dataframe.index, name="bullish_pattern"),
+        pd.Series(bearish_pattern, index=dataframe.index, name="bearish_pattern"),
+    )
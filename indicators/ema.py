@@ -0,0 +1,58 @@
+import numpy as np
+
+from utils._njit import njit
+
+
+@njit(cache=True, nogil=True)
+def _ema_fused(values: np.ndarray, periods: np.ndarray) -> np.ndarray:
+    n = values.shape[0]
+    count = periods.shape[0]
+    out = np.full((count, n), np.nan)
+    alphas = 2.0 / (periods + 1.0)
+    ema = np.zeros(count)
+
+    # Like the TA-Lib wrapper, the leading NaNs are skipped
+    start = 0
+    while start < n and np.isnan(values[start]):
+        start += 1
+
+    for i in range(start, n):
+        value = float(values[i])
+        for p in range(count):
+            seed_index = start + periods[p] - 1
+            if i < seed_index:
+                ema[p] += value
+            elif i == seed_index:
+                ema[p] = (ema[p] + value) / periods[p]
+                out[p, i] = ema[p]
+            else:
+                ema[p] = (value - ema[p]) * alphas[p] + ema[p]
+                out[p, i] = ema[p]
+    return out
+
+
+def ema_fused(values: np.ndarray, periods) -> np.ndarray:
+    """
+    Exponential moving averages of `values` for several periods in a single pass.
+
+    Same results as calling `talib.EMA(values, timeperiod=period)` for each period:
+    the first value of each EMA is the simple average of its first `period` values,
+    the values before it are NaN.
+
+    Parameters:
+    ----------
+    values : np.ndarray
+        The input values, usually the close prices.
+    periods : sequence of int
+        The EMA periods, each must be at least 2.
+
+    Returns:
+    -------
+    np.ndarray
+        A float64 array of shape (len(periods), len(values)), one row per period.
+    """
+    periods = np.asarray(periods, dtype=np.int64)
+    if periods.ndim != 1 or (periods < 2).any():
+        raise ValueError("'periods' must be a sequence of integers of at least 2.")
+
+    return _ema_fused(values, periods)
@@ -2,11 +2,55 @@ from typing import Tuple
 
 import numpy as np
 import pandas as pd
-import technical.qtpylib as qtpylib
+
+from utils._njit import njit
+
+# Bar colors, the categories of the color series returned by `hawkeye_volume`
+HAWKEYE_COLORS = ["gray", "#3D9970", "#FF4136", "blue"]
+
+
+def _shift(values: np.ndarray) -> np.ndarray:
+    """
+    Shift an array forward by one period, same as `pd.Series.shift(1)`.
+    """
+    shifted = np.empty_like(values)
+    shifted[:1] = np.nan
+    shifted[1:] = values[:-1]
+    return shifted
+
+
+@njit(cache=True)
+def _sma(values: np.ndarray, window: int) -> np.ndarray:
+    """
+    Simple moving average using a running window sum, one add and one subtract per step.
+    Like `qtpylib.sma`, a value is only produced once the window is full and NaN-free.
+    """
+    out = np.empty_like(values)
+    out[:] = np.nan
+    # Sum in float64 even for float32 input, so the running sum doesn't drift
+    total = 0.0
+    nans = 0
+    for i in range(values.shape[0]):
+        if np.isnan(values[i]):
+            nans += 1
+        else:
+            total += values[i]
+        if i >= window:
+            if np.isnan(values[i - window]):
+                nans -= 1
+            else:
+                total -= values[i - window]
+        if i >= window - 1 and nans == 0:
+            out[i] = total / window
+    return out
 
 
 def hawkeye_volume(
-    dataframe: pd.DataFrame, length: int = 200, hv_ma: int = 20, divisor: float = 3.6
+    dataframe: pd.DataFrame,
+    length: int = 200,
+    hv_ma: int = 20,
+    divisor: float = 3.6,
+    dtype=np.float32,
 ) -> Tuple[pd.Series, pd.Series]:
     """
     Calculate the Hawkeye Volume indicator based on the given DataFrame.
@@ -17,73 +61,68 @@ def hawkeye_volume(
     :param length: The window length for calculating long-term moving averages (default is 200).
     :param hv_ma: The window length for calculating short-term moving averages (default is 20).
     :param divisor: A divisor value used for calculating upper and lower bounds of the price range (default is 3.6).
+    :param dtype: The float dtype the indicator is computed in (default is np.float32, half the memory
+                  traffic of float64). The volume moving average is still returned as float64.
     :return: A tuple of (volume moving average, volume color series).
+             The colors are a categorical with the `HAWKEYE_COLORS` categories, stored as 1 byte codes.
     """
-    df = dataframe.copy()
+    high = dataframe["high"].to_numpy(dtype=dtype)
+    low = dataframe["low"].to_numpy(dtype=dtype)
+    close = dataframe["close"].to_numpy(dtype=dtype)
+    volume = dataframe["volume"].to_numpy(dtype=dtype)
+
     # Calculate the moving average of volume
-    df["range"] = df["high"] - df["low"]
-    df["rangeAvg"] = qtpylib.sma(df["range"], window=length)
-    df["durchschnitt"] = qtpylib.sma(df["volume"], window=hv_ma)
-    df["volumeA"] = qtpylib.sma(df["volume"], window=length)
-    df["mid"] = qtpylib.mid_price(df)
-
-    df["u"] = df["mid"] + (df["high"] - df["low"]) / divisor
-    df["d"] = df["mid"] - (df["high"] - df["low"]) / divisor
-
-    # Define conditions based on the Pine Script logic
-    df["r_enabled1"] = (
-        (df["range"] > df["rangeAvg"])
-        & (df["close"] < df["d"].shift(1))
-        & (df["volume"] > df["volumeA"])
-    )
-    df["r_enabled2"] = df["close"] < df["mid"].shift(1)
-    df["r_enabled"] = df["r_enabled1"] | df["r_enabled2"]
-
-    df["g_enabled1"] = df["close"] > df["mid"].shift(1)
-    df["g_enabled2"] = (
-        (df["range"] > df["rangeAvg"])
-        & (df["close"] > df["u"].shift(1))
-        & (df["volume"] > df["volumeA"])
-    )
-    df["g_enabled3"] = (
-        (df["high"] > df["high"].shift(1))
-        & (df["range"] < df["rangeAvg"] / 1.5)
-        & (df["volume"] < df["volumeA"])
-    )
-    df["g_enabled4"] = (
-        (df["low"] < df["low"].shift(1))
-        & (df["range"] < df["rangeAvg"] / 1.5)
-        & (df["volume"] > df["volumeA"])
-    )
-    df["g_enabled"] = (
-        df["g_enabled1"] | df["g_enabled2"] | df["g_enabled3"] | df["g_enabled4"]
-    )
+    price_range = high - low
+    range_avg = _sma(price_range, length)
+    durchschnitt = _sma(volume, hv_ma)
+    volume_a = _sma(volume, length)
+    mid = 0.5 * (high + low)
 
-    df["gr_enabled1"] = (
-        (df["range"] > df["rangeAvg"])
-        & (df["close"] > df["d"].shift(1))
-        & (df["close"] < df["u"].shift(1))
-        & (df["volume"] > df["volumeA"])
-        & (df["volume"] < df["volumeA"] * 1.5)
-        & (df["volume"] > df["volume"].shift(1))
-    )
-    df["gr_enabled2"] = (df["range"] < df["rangeAvg"] / 1.5) & (
-        df["volume"] < df["volumeA"] / 1.5
-    )
-    df["gr_enabled3"] = (df["close"] > df["d"].shift(1)) & (
-        df["close"] < df["u"].shift(1)
+    band = price_range / divisor
+    u = mid + band
+    d = mid - band
+
+    # Previous bar values, shifted once and shared by the conditions below
+    prev_mid = _shift(mid)
+    prev_u = _shift(u)
+    prev_d = _shift(d)
+
+    # Shared sub-expressions of the conditions below
+    wide_range = price_range > range_avg
+    narrow_range = price_range < range_avg / 1.5
+    high_volume = volume > volume_a
+    inside_band = (close > prev_d) & (close < prev_u)
+
+    # Define conditions based on the Pine Script logic.
+    # The conditions of each color are OR-ed in place into a single buffer.
+    r_enabled = wide_range & (close < prev_d) & high_volume
+    r_enabled |= close < prev_mid
+
+    g_enabled = close > prev_mid
+    g_enabled |= wide_range & (close > prev_u) & high_volume
+    g_enabled |= (high > _shift(high)) & narrow_range & (volume < volume_a)
+    g_enabled |= (low < _shift(low)) & narrow_range & high_volume
+
+    gr_enabled = (
+        wide_range
+        & inside_band
+        & high_volume
+        & (volume < volume_a * 1.5)
+        & (volume > _shift(volume))
     )
-    df["gr_enabled"] = df["gr_enabled1"] | df["gr_enabled2"] | df["gr_enabled3"]
-
-    # Set the color based on the conditions
-    df["v_color"] = np.where(
-        df["gr_enabled"],
-        "gray",
-        np.where(
-            df["g_enabled"],
-            "#3D9970",
-            np.where(df["r_enabled"], "#FF4136", "blue"),
+    gr_enabled |= narrow_range & (volume < volume_a / 1.5)
+    gr_enabled |= inside_band
+
+    # Set the color code based on the conditions, the first matching condition wins
+    v_color = np.select([gr_enabled, g_enabled, r_enabled], [0, 1, 2], 3)
+
+    return (
+        pd.Series(
+            durchschnitt, index=dataframe.index, name="durchschnitt", dtype=np.float64
+        ),
+        pd.Series(
+            pd.Categorical.from_codes(v_color.astype(np.int8), HAWKEYE_COLORS),
+            index=dataframe.index,
+            name="v_color",
         ),
     )
-
-    return df["durchschnitt"], df["v_color"]
@@ -1,8 +1,101 @@
 import numpy as np
 import pandas as pd
 
+from utils._njit import njit
 
-def pivot_low(dataframe, left, right):
+
+@njit(cache=True, nogil=True)
+def _deque_push(
+    deque: np.ndarray, head: int, size: int, values: np.ndarray, sign: float, index: int
+) -> int:
+    """
+    Push `index` to the back of a monotonic ring buffer deque, returns the new size.
+    """
+    capacity = deque.shape[0]
+    while (
+        size > 0
+        and sign * values[deque[(head + size - 1) % capacity]] >= sign * values[index]
+    ):
+        size -= 1
+    deque[(head + size) % capacity] = index
+    return size + 1
+
+
+@njit(cache=True, nogil=True)
+def _pivot(
+    values: np.ndarray,
+    prices: np.ndarray,
+    left: int,
+    right: int,
+    is_high: bool,
+    ffill: bool,
+) -> np.ndarray:
+    """
+    Single pass pivot scan of `values`, the reported pivots are taken from `prices`.
+    The minimums (maximums for `is_high`) of the left window `[i - left, i - 1]` and of the
+    right window `[i + 1, i + right]` are tracked with two monotonic deques, so it runs in O(N)
+    for any window size. With `ffill` the last pivot is carried forward instead of NaN.
+    """
+    n = values.shape[0]
+    # A pivot high is a pivot low of the negated values
+    sign = -1.0 if is_high else 1.0
+    out = np.full(n, np.nan)
+    left_deque = np.empty(left, dtype=np.int64)
+    left_head = 0
+    left_size = 0
+    right_deque = np.empty(right, dtype=np.int64)
+    right_head = 0
+    right_size = 0
+    # A window containing a NaN never has a pivot
+    last_nan = -1
+    last_pivot = np.nan
+
+    # The right window of i = 0, its last index enters in the loop below
+    for j in range(right):
+        if np.isnan(values[j]):
+            last_nan = j
+        elif j > 0:
+            right_size = _deque_push(
+                right_deque, right_head, right_size, values, sign, j
+            )
+
+    for i in range(n):
+        # i - 1 enters the left window, i - left - 1 leaves it
+        if left_size > 0 and left_deque[left_head] < i - left:
+            left_head = (left_head + 1) % left
+            left_size -= 1
+        if i > 0 and not np.isnan(values[i - 1]):
+            left_size = _deque_push(
+                left_deque, left_head, left_size, values, sign, i - 1
+            )
+
+        # i + right enters the right window, i leaves it
+        if right_size > 0 and right_deque[right_head] <= i:
+            right_head = (right_head + 1) % right
+            right_size -= 1
+        j = i + right
+        if j < n:
+            if np.isnan(values[j]):
+                last_nan = j
+            else:
+                right_size = _deque_push(
+                    right_deque, right_head, right_size, values, sign, j
+                )
+
+        if left <= i < n - right and last_nan < i - left:
+            ref = sign * values[i]
+            if (
+                ref < sign * values[left_deque[left_head]]
+                and ref <= sign * values[right_deque[right_head]]
+            ):
+                last_pivot = prices[i]
+                out[i] = last_pivot
+        if ffill:
+            out[i] = last_pivot
+    return out
+
+
+def pivot_low(dataframe, left, right, dtype=np.float32, ffill=False):
     """
     Identifies pivot low points in a given DataFrame based on the specified left and right window sizes.
 
@@ -17,6 +110,13 @@ def pivot_low(dataframe, left, right):
         The number of preceding values to compare against.
     right : int
         The number of succeeding values to compare against.
+    dtype : np.dtype
+        The float dtype the comparisons run in (default is np.float32). float32 halves the memory
+        traffic, prices closer than its ~7 significant digits compare as equal.
+        The pivots are still returned as float64.
+    ffill : bool
+        Carry the last pivot low forward instead of NaN, same as `.ffill()` on the result
+        (default is False).
 
     Returns:
     -------
@@ -40,21 +140,13 @@ def pivot_low(dataframe, left, right):
             "The DataFrame is too small for the specified 'left' and 'right' window sizes."
         )
 
-    lows = dataframe["low"]
-    pivot_lows = [np.nan] * len(lows)
-
-    for i in range(left, len(lows) - right):
-        ref = lows.iloc[i]
-        left_window = lows.iloc[i - left : i]
-        right_window = lows.iloc[i + 1 : i + right + 1]
-
-        if all(ref < left_window) and all(ref <= right_window):
-            pivot_lows[i] = ref
+    lows = dataframe["low"].to_numpy(dtype=np.float64)
+    pivot_lows = _pivot(lows.astype(dtype, copy=False), lows, left, right, False, ffill)
 
     return pd.Series(pivot_lows, index=dataframe.index)
 
 
-def pivot_high(dataframe, left, right):
+def pivot_high(dataframe, left, right, dtype=np.float32, ffill=False):
     """
     Identifies pivot high points in a given DataFrame based on the specified left and right window sizes.
 
@@ -69,6 +161,13 @@ def pivot_high(dataframe, left, right):
         The number of preceding values to compare against.
     right : int
         The number of succeeding values to compare against.
+    dtype : np.dtype
+        The float dtype the comparisons run in (default is np.float32). float32 halves the memory
+        traffic, prices closer than its ~7 significant digits compare as equal.
+        The pivots are still returned as float64.
+    ffill : bool
+        Carry the last pivot high forward instead of NaN, same as `.ffill()` on the result
+        (default is False).
 
     Returns:
     -------
@@ -92,15 +191,9 @@ def pivot_high(dataframe, left, right):
             "The DataFrame is too small for the specified 'left' and 'right' window sizes."
         )
 
-    highs = dataframe["high"]
-    pivot_highs = [np.nan] * len(highs)
-
-    for i in range(left, len(highs) - right):
-        ref = highs.iloc[i]
-        left_window = highs.iloc[i - left : i]
-        right_window = highs.iloc[i + 1 : i + right + 1]
-
-        if all(ref > left_window) and all(ref >= right_window):
-            pivot_highs[i] = ref
+    highs = dataframe["high"].to_numpy(dtype=np.float64)
+    pivot_highs = _pivot(
+        highs.astype(dtype, copy=False), highs, left, right, True, ffill
+    )
 
     return pd.Series(pivot_highs, index=dataframe.index)
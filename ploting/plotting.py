@@ -1,20 +1,34 @@
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import chain, islice
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, Iterable, Iterator, List, Optional, Union
 
+import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
+from plotly.basedatatypes import BaseTraceType
 from plotly.offline import plot
 from plotly.subplots import make_subplots
 from tqdm import tqdm
 
 from utils.logger import logger
 
+# Volume bar colors, indexed by whether the candle closed above its open
+VOLUME_COLORS = np.array(["#FF4136", "#3D9970"])
 
-def create_scatter(data, column_name, color, direction) -> Optional[go.Scatter]:
+
+def create_scatter(
+    data, column_name, color, direction, use_gl: bool = False
+) -> Optional[Union[go.Scatter, go.Scattergl]]:
     if column_name in data.columns:
         df_short = data[data[column_name] == 1]
         if len(df_short) > 0:
-            shorts = go.Scatter(
+            scatter = go.Scattergl if use_gl else go.Scatter
+            shorts = scatter(
                 x=df_short.date,
                 y=df_short.close,
                 mode="markers",
@@ -34,16 +48,18 @@ def create_scatter(data, column_name, color, direction) -> Optional[go.Scatter]:
 
 
 def add_indicators(
-    fig, row, indicators: Dict[str, Dict], data: pd.DataFrame
-) -> make_subplots:
+    indicators: Dict[str, Dict], data: pd.DataFrame
+) -> List[BaseTraceType]:
     """
     Generate all the indicators selected by the user for a specific row, based on the configuration
-    :param fig: Plot figure to append to
-    :param row: row number for this plot
     :param indicators: Dict of Indicators with configuration options.
                        Dict key must correspond to dataframe column.
+                       Bar indicators can take their colors from the column named by "colors",
+                       either a categorical of colors or codes into the "palette" list when one is given.
     :param data: candlestick DataFrame
+    :return: List of the indicator traces
     """
+    traces = []
     plot_kinds = {
         "scatter": go.Scatter,
         "bar": go.Bar,
@@ -57,20 +73,21 @@ def add_indicators(
             color = conf.get("color")
             if plot_type == "bar":
                 marker_colors = color if color else "DarkSlateGrey"
-                if (
-                    "volume" in indicator
-                    or "Volume" in indicator
-                    or "Vol" in indicator
-                    or "vol" in indicator
-                ):
-                    marker_colors = [
-                        "#3D9970" if close > open else "#FF4136"
-                        for open, close in zip(data.open, data.close)
-                    ]
+                if "vol" in indicator.lower():
+                    rising = data["close"].to_numpy() > data["open"].to_numpy()
+                    marker_colors = VOLUME_COLORS[rising.astype(np.int8)]
                 colors = conf.get("colors")
-                marker_colors = (
-                    data[colors] if colors in data.columns else marker_colors
-                )
+                if colors in data.columns:
+                    marker_colors = data[colors]
+                    palette = conf.get("palette")
+                    if isinstance(marker_colors.dtype, pd.CategoricalDtype):
+                        # The categories are the colors, look them up by code
+                        marker_colors = np.asarray(marker_colors.cat.categories)[
+                            marker_colors.cat.codes.to_numpy()
+                        ]
+                    elif palette is not None:
+                        # The column holds color codes, look the colors up
+                        marker_colors = np.asarray(palette)[marker_colors.to_numpy()]
                 kwargs.update(
                     {"marker_color": marker_colors, "marker_line_color": marker_colors}
                 )
@@ -85,8 +102,7 @@ def add_indicators(
                     )
 
             kwargs.update(conf.get("plotly", {}))
-            trace = plot_kinds[plot_type](**kwargs)
-            fig.add_trace(trace, row, 1)
+            traces.append(plot_kinds[plot_type](**kwargs))
         else:
             plot_type = conf.get("type")
             if plot_type == "area":
@@ -96,9 +112,7 @@ def add_indicators(
                         if "fill_color" in conf
                         else "rgba(0,176,246,0.2)"
                     )
-                    fig = plot_area(
-                        fig,
-                        1,
+                    traces += plot_area(
                         data,
                         conf["indicator_a"],
                         conf["indicator_b"],
@@ -111,24 +125,33 @@ def add_indicators(
                 indicator,
             )
 
-    return fig
+    return traces
 
 
-def plot_trades(fig, trades: pd.DataFrame) -> make_subplots:
+def plot_trades(trades: pd.DataFrame, use_gl: bool = False) -> List[BaseTraceType]:
     """
-    Add trades to "fig"
+    Generate the trade entry and exit traces
+    :param trades: All trades created
+    :param use_gl: Draw the trade markers with WebGL (Scattergl), faster for many trades
+    :return: List of the trade traces
     """
+    traces = []
     # Trades can be empty
     if trades is not None and len(trades) > 0:
+        scatter = go.Scattergl if use_gl else go.Scatter
         # Create description for exit summarizing the trade
-        trades["desc"] = trades.apply(
-            lambda row: f"{row['profit_ratio']:.2%}, "
-            + (f"{row['enter_tag']}, " if row["enter_tag"] is not None else "")
-            + f"{row['exit_reason']}, "
-            + f"{row['trade_duration']} min",
-            axis=1,
+        enter_tag = trades["enter_tag"]
+        enter_tag = (enter_tag.astype(str) + ", ").where(enter_tag.notna(), "")
+        trades["desc"] = (
+            trades["profit_ratio"].map("{:.2%}".format)
+            + ", "
+            + enter_tag
+            + trades["exit_reason"].astype(str)
+            + ", "
+            + trades["trade_duration"].astype(str)
+            + " min"
         )
-        trade_entries = go.Scatter(
+        trade_entries = scatter(
             x=trades["open_date"],
             y=trades["open_rate"],
             mode="markers",
@@ -139,7 +162,7 @@ def plot_trades(fig, trades: pd.DataFrame) -> make_subplots:
             ),
         )
 
-        trade_exits = go.Scatter(
+        trade_exits = scatter(
             x=trades.loc[trades["profit_ratio"] > 0, "close_date"],
             y=trades.loc[trades["profit_ratio"] > 0, "close_rate"],
             text=trades.loc[trades["profit_ratio"] > 0, "desc"],
@@ -149,7 +172,7 @@ def plot_trades(fig, trades: pd.DataFrame) -> make_subplots:
                 symbol="square-open", size=11, line=dict(width=2), color="green"
             ),
         )
-        trade_exits_loss = go.Scatter(
+        trade_exits_loss = scatter(
             x=trades.loc[trades["profit_ratio"] <= 0, "close_date"],
             y=trades.loc[trades["profit_ratio"] <= 0, "close_rate"],
             text=trades.loc[trades["profit_ratio"] <= 0, "desc"],
@@ -157,33 +180,28 @@ def plot_trades(fig, trades: pd.DataFrame) -> make_subplots:
             name="Exit - Loss",
             marker=dict(symbol="square-open", size=11, line=dict(width=2), color="red"),
         )
-        fig.add_trace(trade_entries, 1, 1)
-        fig.add_trace(trade_exits, 1, 1)
-        fig.add_trace(trade_exits_loss, 1, 1)
+        traces += [trade_entries, trade_exits, trade_exits_loss]
     else:
         logger.debug("No trades found.")
-    return fig
+    return traces
 
 
 def plot_area(
-    fig,
-    row: int,
     data: pd.DataFrame,
     indicator_a: str,
     indicator_b: str,
     label: str = "",
     fill_color: str = "rgba(0,176,246,0.2)",
-) -> make_subplots:
-    """Creates a plot for the area between two traces and adds it to fig.
-    :param fig: Plot figure to append to
-    :param row: row number for this plot
+) -> List[BaseTraceType]:
+    """Creates a plot for the area between two traces.
     :param data: candlestick DataFrame
     :param indicator_a: indicator name as populated in strategy
     :param indicator_b: indicator name as populated in strategy
     :param label: label for the filled area
     :param fill_color: color to be used for the filled area
-    :return: fig with added  filled_traces plot
+    :return: List of the filled area traces, empty if an indicator is missing
     """
+    traces = []
     if indicator_a in data and indicator_b in data:
         # make lines invisible to get the area plotted, only.
         line = {"color": "rgba(255,255,255,0)"}
@@ -199,29 +217,25 @@ def plot_area(
             fillcolor=fill_color,
             line=line,
         )
-        fig.add_trace(trace_a, row, 1)
-        fig.add_trace(trace_b, row, 1)
-    return fig
+        traces += [trace_a, trace_b]
+    return traces
 
 
-def add_areas(fig, row: int, data: pd.DataFrame, indicators) -> make_subplots:
-    """Adds all area plots (specified in plot_config) to fig.
-    :param fig: Plot figure to append to
-    :param row: row number for this plot
+def add_areas(data: pd.DataFrame, indicators) -> List[BaseTraceType]:
+    """Generates all area plots (specified in plot_config).
     :param data: candlestick DataFrame
     :param indicators: dict with indicators. ie.: plot_config['main_plot'] or
                             plot_config['subplots'][subplot_label]
-    :return: fig with added  filled_traces plot
+    :return: List of the filled area traces
     """
+    traces = []
     for indicator, ind_conf in indicators.items():
         if "fill_to" in ind_conf:
             indicator_b = ind_conf["fill_to"]
             if indicator in data and indicator_b in data:
                 label = ind_conf.get("fill_label", f"{indicator}<>{indicator_b}")
                 fill_color = ind_conf.get("fill_color", "rgba(0,176,246,0.2)")
-                fig = plot_area(
-                    fig,
-                    row,
+                traces += plot_area(
                     data,
                     indicator,
                     indicator_b,
@@ -240,7 +254,7 @@ def add_areas(fig, row: int, data: pd.DataFrame, indicators) -> make_subplots:
                     "in your strategy.",
                     indicator_b,
                 )
-    return fig
+    return traces
 
 
 def create_plotconfig(
@@ -288,6 +302,7 @@ def generate_candlestick_graph(
     indicators1: Optional[List[str]] = None,
     indicators2: Optional[List[str]] = None,
     plot_config: Optional[Dict[str, Dict]] = None,
+    use_gl: bool = False,
 ) -> go.Figure:
     """
     Generate the graph from the data generated by Backtesting or from DB
@@ -298,6 +313,8 @@ def generate_candlestick_graph(
     :param indicators1: List containing Main plot indicators
     :param indicators2: List containing Sub plot indicators
     :param plot_config: Dict of Dicts containing advanced plot configuration
+    :param use_gl: Draw the signal and trade markers with WebGL (Scattergl),
+                   faster for long backtests with many markers
     :return: Plotly figure
     """
     plot_config = create_plotconfig(
@@ -334,35 +351,34 @@ def generate_candlestick_graph(
         increasing={"fillcolor": "#3D9970"},
         decreasing={"fillcolor": "#FF4136"},
     )
-    fig.add_trace(candles, 1, 1)
+    # Collect all traces first and add them to the figure in a single call
+    traces = [candles]
 
-    longs = create_scatter(data, "enter_long", "green", "up")
-    exit_longs = create_scatter(data, "exit_long", "red", "down")
-    shorts = create_scatter(data, "enter_short", "blue", "down")
-    exit_shorts = create_scatter(data, "exit_short", "violet", "up")
+    longs = create_scatter(data, "enter_long", "green", "up", use_gl)
+    exit_longs = create_scatter(data, "exit_long", "red", "down", use_gl)
+    shorts = create_scatter(data, "enter_short", "blue", "down", use_gl)
+    exit_shorts = create_scatter(data, "exit_short", "violet", "up", use_gl)
 
     for scatter in [longs, exit_longs, shorts, exit_shorts]:
         if scatter:
-            fig.add_trace(scatter, 1, 1)
+            traces.append(scatter)
 
     # Add Bollinger Bands
-    fig = plot_area(
-        fig, 1, data, "bb_lowerband", "bb_upperband", label="Bollinger Band"
-    )
-    # prevent bb_lower and bb_upper from plotting
-    try:
-        del plot_config["main_plot"]["bb_lowerband"]
-        del plot_config["main_plot"]["bb_upperband"]
-    except KeyError:
-        pass
+    if {"bb_lowerband", "bb_upperband"} <= set(data.columns):
+        traces += plot_area(
+            data, "bb_lowerband", "bb_upperband", label="Bollinger Band"
+        )
+        # prevent bb_lower and bb_upper from plotting
+        plot_config["main_plot"].pop("bb_lowerband", None)
+        plot_config["main_plot"].pop("bb_upperband", None)
     # main plot goes to row 1
-    fig = add_indicators(fig=fig, row=1, indicators=plot_config["main_plot"], data=data)
-    fig = add_areas(fig, 1, data, plot_config["main_plot"])
-    fig = plot_trades(fig, trades)
+    traces += add_indicators(indicators=plot_config["main_plot"], data=data)
+    traces += add_areas(data, plot_config["main_plot"])
+    traces += plot_trades(trades, use_gl)
+    trace_rows = [1] * len(traces)
     # sub plot: Volume goes to row 2
-    # volume_colors = [
-    #     "#3D9970" if close > open else "#FF4136"
-    #     for open, close in zip(data.open, data.close)
+    # volume_colors = VOLUME_COLORS[
+    #     (data["close"].to_numpy() > data["open"].to_numpy()).astype(np.int8)
     # ]
     # volume = go.Bar(
     #     x=data["date"],
@@ -371,14 +387,19 @@ def generate_candlestick_graph(
     #     marker_color=volume_colors,
     #     marker_line_color=volume_colors,
     # )
-    # fig.add_trace(volume, 2, 1)
+    # traces.append(volume)
+    # trace_rows.append(2)
     # add each sub plot to a separate row
     for i, label in enumerate(plot_config["subplots"]):
         sub_config = plot_config["subplots"][label]
         row = 2 + i
-        fig = add_indicators(fig=fig, row=row, indicators=sub_config, data=data)
+        sub_traces = add_indicators(indicators=sub_config, data=data)
         # fill area between indicators ( 'fill_to': 'other_indicator')
-        fig = add_areas(fig, row, data, sub_config)
+        sub_traces += add_areas(data, sub_config)
+        traces += sub_traces
+        trace_rows += [row] * len(sub_traces)
+
+    fig.add_traces(traces, rows=trace_rows, cols=[1] * len(traces))
 
     # Ensure unified hover behavior across all subplots
     fig.update_layout(
@@ -437,24 +458,102 @@ def store_plot_file(
     logger.info(f"Stored plot as {_filename}")
 
 
-def generate_figures_from_dataframes(dataframes: List, title, plot_config):
+def _generate_figure_dict(data: pd.DataFrame, title: str, plot_config) -> Dict:
     """
-    Generate a list of candlestick chart figures from a list of DataFrames using the same title.
+    Build one candlestick figure as a dict, module level so it can run in a worker process.
+    """
+    return generate_candlestick_graph(
+        title=title, data=data, plot_config=plot_config
+    ).to_dict()
+
+
+def iter_figures(
+    dataframes: Iterable[pd.DataFrame],
+    title,
+    plot_config,
+    max_workers: Optional[int] = None,
+) -> Iterator[Dict]:
+    """
+    Lazily generate candlestick chart figures from DataFrames using the same title.
+    The figures are built in parallel worker processes and yielded one at a time, in order.
+    At most `2 * max_workers` DataFrames are submitted ahead of the consumer, so neither the
+    DataFrames nor the finished figures pile up in memory.
+    The workers are spawned, they re-import the `__main__` module: a script calling this at
+    its top level must do it under an `if __name__ == "__main__":` guard.
+    A single DataFrame, or `max_workers=1`, is processed in the calling process.
 
     Parameters:
-        dataframes (list of pd.DataFrame): List of DataFrames, each containing 'Open', 'High', 'Low', and 'Close' columns.
+        dataframes (iterable of pd.DataFrame): DataFrames, each containing 'Open', 'High', 'Low', and 'Close' columns.
         title (str): The title for all the charts.
         plot_config (dict): Configuration dictionary for customizing the plots.
+        max_workers (int, optional): The number of worker processes (default is the CPU count).
 
-    Returns:
-        list of go.Figure: List of Plotly figure objects.
+    Yields:
+        dict: Plotly figure as a dict.
     """
+    generate_figure = partial(
+        _generate_figure_dict, title=title, plot_config=plot_config
+    )
+    workers = max_workers or os.cpu_count() or 1
+    dataframes = iter(dataframes)
+    # Peek at the first two DataFrames, a pool isn't worth starting for less
+    head = list(islice(dataframes, 2))
+    dataframes = chain(head, dataframes)
+
+    if workers == 1 or len(head) <= 1:
+        yield from map(generate_figure, dataframes)
+        return
+
+    # Spawn the workers instead of forking a parent that runs the logger listener
+    # and thread pool threads, a fork only copies the calling thread
+    with ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+    ) as executor:
+        pending = deque(
+            executor.submit(generate_figure, dataframe)
+            for dataframe in islice(dataframes, 2 * workers)
+        )
+        try:
+            while pending:
+                figure = pending.popleft().result()
+                # Refill before yielding, so the workers keep busy while the consumer runs
+                for dataframe in islice(dataframes, 1):
+                    pending.append(executor.submit(generate_figure, dataframe))
+                yield figure
+        finally:
+            # The consumer may stop early, don't build the figures nobody will read
+            for future in pending:
+                future.cancel()
+
+
+def generate_figures_from_dataframes(
+    dataframes: Iterable[pd.DataFrame],
+    title,
+    plot_config,
+    max_workers: Optional[int] = None,
+):
+    """
+    Generate a list of candlestick chart figures from a list of DataFrames using the same title.
+    Use `iter_figures` to process the figures one at a time instead.
+    Like `iter_figures`, a script calling this at its top level must do it under an
+    `if __name__ == "__main__":` guard, the worker processes re-import the `__main__` module.
 
-    figures = []
+    Parameters:
+        dataframes (iterable of pd.DataFrame): DataFrames, each containing 'Open', 'High', 'Low', and 'Close' columns.
+        title (str): The title for all the charts.
+        plot_config (dict): Configuration dictionary for customizing the plots.
+        max_workers (int, optional): The number of worker processes (default is the CPU count),
+            1 builds the figures in the calling process.
 
+    Returns:
+        list of dict: List of Plotly figures as dicts.
+    """
     # Using tqdm to display a progress bar
-    for df in tqdm(dataframes, desc="Generating Figures"):
-        fig = generate_candlestick_graph(title=title, data=df, plot_config=plot_config)
-        figures.append(fig.to_dict())
-
-    return figures
+    return list(
+        tqdm(
+            iter_figures(dataframes, title, plot_config, max_workers=max_workers),
+            # Generators and other unsized iterables get a progress bar without a total
+            total=len(dataframes) if hasattr(dataframes, "__len__") else None,
+            desc="Generating Figures",
+        )
+    )
@@ -1,105 +1,195 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
 import pandas as pd
-import talib.abstract as ta
-import technical.vendor.qtpylib.indicators as qtpylib
+import talib
 
+from indicators.bb import bollinger_fused
 from indicators.candlestick_patterns import find_candlestick_patterns
+from indicators.ema import ema_fused
 from indicators.hawkeye_volume import hawkeye_volume
 from indicators.pivot import pivot_high, pivot_low
 from ploting.plotting import generate_candlestick_graph, store_plot_file
+from utils._njit import njit
 from utils.logger import logger
 from utils.utils import (
     dataframe_date_to_date,
+    feather_cache,
     load_dataframe,
 )
 
 
+@njit(cache=True, nogil=True)
+def _populate_signals(
+    open_: np.ndarray,
+    high: np.ndarray,
+    low: np.ndarray,
+    volume: np.ndarray,
+    sar: np.ndarray,
+    rsi: np.ndarray,
+    adx: np.ndarray,
+    pivot_highs: np.ndarray,
+    pivot_lows: np.ndarray,
+    bullish_candle: np.ndarray,
+    bearish_candle: np.ndarray,
+):
+    """
+    Compute the enter_short, enter_long, exit_long and exit_short signals (0 or 1)
+    in a single pass over the indicator arrays.
+    """
+    n = open_.shape[0]
+    enter_short = np.zeros(n, dtype=np.int8)
+    enter_long = np.zeros(n, dtype=np.int8)
+    exit_long = np.zeros(n, dtype=np.int8)
+    exit_short = np.zeros(n, dtype=np.int8)
+    for i in range(n):
+        if adx[i] > 25:
+            if (
+                high[i] > pivot_highs[i]
+                and bearish_candle[i] == 1
+                and open_[i] < pivot_highs[i]
+                and rsi[i] > 60
+            ):
+                enter_short[i] = 1
+            if (
+                low[i] < pivot_lows[i]
+                and bullish_candle[i] == 1
+                and open_[i] > pivot_lows[i]
+                and rsi[i] <= 40
+            ):
+                enter_long[i] = 1
+        # SAR flips, compared with the previous candle
+        if i > 0 and volume[i] > 0:
+            if high[i] <= sar[i] and low[i - 1] > sar[i - 1]:
+                exit_long[i] = 1
+            if low[i] >= sar[i] and high[i - 1] < sar[i - 1]:
+                exit_short[i] = 1
+    return enter_short, enter_long, exit_long, exit_short
+
+
+# Set TRADING_CACHE=1 to reuse the indicators of a previous run on the same data
+@feather_cache(
+    "./cache",
+    enabled=os.environ.get("TRADING_CACHE") == "1",
+    dependencies=(
+        bollinger_fused,
+        find_candlestick_patterns,
+        ema_fused,
+        hawkeye_volume,
+        pivot_high,
+    ),
+)
 def populate_indicators(dataframe: pd.DataFrame) -> pd.DataFrame:
-    # RSI
-    dataframe["rsi"] = ta.RSI(dataframe, timeperiod=14)
-
-    # ADX
-    dataframe["adx"] = ta.ADX(dataframe, timeperiod=14)
-
-    # Parabolic SAR
-    dataframe["sar"] = ta.SAR(dataframe, acceleration=0.02, maximum=0.2)
-
-    # Hawkeye Volume
-    dataframe["durchschnitt"], dataframe["v_color"] = hawkeye_volume(
-        dataframe=dataframe
-    )
-
-    # Pivot high/low
-    dataframe["pivot_highs"] = pivot_high(dataframe=dataframe, left=10, right=2)
-    dataframe["pivot_lows"] = pivot_low(dataframe=dataframe, left=10, right=2)
-
-    dataframe["pivot_lows"] = dataframe["pivot_lows"].ffill()
-    dataframe["pivot_highs"] = dataframe["pivot_highs"].ffill()
-
-    # Candlestick pattern
-    dataframe["bullish_candle"], dataframe["bearish_candle"] = (
-        find_candlestick_patterns(dataframe=dataframe)
-    )
-
-    # EMA
-    dataframe["ema34"] = ta.EMA(dataframe, timeperiod=34)
-    dataframe["ema89"] = ta.EMA(dataframe, timeperiod=89)
-    dataframe["ema200"] = ta.EMA(dataframe, timeperiod=200)
-
-    # Bollinger Bands
-    bollinger = qtpylib.bollinger_bands(
-        qtpylib.typical_price(dataframe), window=20, stds=2
+    # TA-Lib computes in float64, the indicator columns are stored as float32
+    # like the OHLCV columns from `load_dataframe`, halving their memory traffic.
+    # The columns are collected here and added to the DataFrame with a single concat
+    # at the end, instead of one block insert per column.
+    indicators = {}
+
+    # TA-Lib works on float64 arrays, converted once and shared by the calls below
+    high = dataframe["high"].to_numpy(dtype=np.float64)
+    low = dataframe["low"].to_numpy(dtype=np.float64)
+    close = dataframe["close"].to_numpy(dtype=np.float64)
+
+    # The Numba kernels release the GIL, they run on the thread pool while the
+    # TA-Lib calls below, which hold it, run on this thread.
+    # The pool is created per call, a module level pool has no threads in a forked child.
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        pivot_highs = executor.submit(
+            pivot_high, dataframe=dataframe, left=10, right=2, ffill=True
+        )
+        pivot_lows = executor.submit(
+            pivot_low, dataframe=dataframe, left=10, right=2, ffill=True
+        )
+        emas = executor.submit(ema_fused, close, (34, 89, 200))
+        bollinger = executor.submit(
+            bollinger_fused,
+            dataframe["high"].to_numpy(),
+            dataframe["low"].to_numpy(),
+            dataframe["close"].to_numpy(),
+            n=20,
+            k=2.0,
+        )
+
+        # RSI
+        indicators["rsi"] = talib.RSI(close, timeperiod=14).astype(np.float32)
+
+        # ADX
+        indicators["adx"] = talib.ADX(high, low, close, timeperiod=14).astype(
+            np.float32
+        )
+
+        # Parabolic SAR
+        indicators["sar"] = talib.SAR(high, low, acceleration=0.02, maximum=0.2).astype(
+            np.float32
+        )
+
+        # Hawkeye Volume
+        indicators["durchschnitt"], indicators["v_color"] = hawkeye_volume(
+            dataframe=dataframe
+        )
+
+        # Candlestick pattern, computed before waiting for the pivots
+        candles = find_candlestick_patterns(dataframe=dataframe)
+
+        # Pivot high/low
+        indicators["pivot_highs"] = pivot_highs.result()
+        indicators["pivot_lows"] = pivot_lows.result()
+
+        indicators["bullish_candle"], indicators["bearish_candle"] = candles
+
+        # EMA
+        ema34, ema89, ema200 = emas.result()
+        indicators["ema34"] = ema34.astype(np.float32)
+        indicators["ema89"] = ema89.astype(np.float32)
+        indicators["ema200"] = ema200.astype(np.float32)
+
+        # Bollinger Bands
+        mid, upper, lower, bb_percent, bb_width = bollinger.result()
+        indicators["bb_lowerband"] = lower.astype(np.float32)
+        indicators["bb_middleband"] = mid.astype(np.float32)
+        indicators["bb_upperband"] = upper.astype(np.float32)
+        indicators["bb_percent"] = bb_percent.astype(np.float32)
+        indicators["bb_width"] = bb_width.astype(np.float32)
+
+    # Entry / exit signals
+    enter_short, enter_long, exit_long, exit_short = _populate_signals(
+        dataframe["open"].to_numpy(),
+        dataframe["high"].to_numpy(),
+        dataframe["low"].to_numpy(),
+        dataframe["volume"].to_numpy(),
+        *(
+            np.asarray(indicators[column])
+            for column in (
+                "sar",
+                "rsi",
+                "adx",
+                "pivot_highs",
+                "pivot_lows",
+                "bullish_candle",
+                "bearish_candle",
+            )
+        ),
     )
-    dataframe["bb_lowerband"] = bollinger["lower"]
-    dataframe["bb_middleband"] = bollinger["mid"]
-    dataframe["bb_upperband"] = bollinger["upper"]
-    dataframe["bb_percent"] = (dataframe["close"] - dataframe["bb_lowerband"]) / (
-        dataframe["bb_upperband"] - dataframe["bb_lowerband"]
+    exit_tag = np.full(len(dataframe), np.nan, dtype=object)
+    exit_tag[exit_long == 1] = "Exit Long - SAR"
+    exit_tag[exit_short == 1] = "Exit Short - SAR"
+
+    indicators["enter_short"] = enter_short
+    indicators["enter_long"] = enter_long
+    indicators["exit_long"] = exit_long
+    indicators["exit_tag"] = exit_tag
+    indicators["exit_short"] = exit_short
+
+    # Replace the indicator columns of a previous run instead of duplicating them
+    return pd.concat(
+        [
+            dataframe.drop(columns=list(indicators), errors="ignore"),
+            pd.DataFrame(indicators, index=dataframe.index),
+        ],
+        axis=1,
     )
-    dataframe["bb_width"] = (
-        dataframe["bb_upperband"] - dataframe["bb_lowerband"]
-    ) / dataframe["bb_middleband"]
-
-    dataframe.loc[
-        (
-            (dataframe["high"] > dataframe["pivot_highs"])
-            & (dataframe["bearish_candle"] == 1)
-            & (dataframe["open"] < dataframe["pivot_highs"])
-            & (dataframe["adx"] > 25)
-            & (dataframe["rsi"] > 60)
-        ),
-        "enter_short",
-    ] = 1
-
-    dataframe.loc[
-        (
-            (dataframe["low"] < dataframe["pivot_lows"])
-            & (dataframe["bullish_candle"] == 1)
-            & (dataframe["open"] > dataframe["pivot_lows"])
-            & (dataframe["adx"] > 25)
-            & (dataframe["rsi"] <= 40)
-        ),
-        "enter_long",
-    ] = 1
-
-    dataframe.loc[
-        (
-            (dataframe["high"] <= dataframe["sar"])
-            & (dataframe["low"].shift(1) > dataframe["sar"].shift(1))
-            & (dataframe["volume"] > 0)
-        ),
-        ["exit_long", "exit_tag"],
-    ] = 1, "Exit Long - SAR"
-
-    dataframe.loc[
-        (
-            (dataframe["low"] >= dataframe["sar"])
-            & (dataframe["high"].shift(1) < dataframe["sar"].shift(1))
-            & (dataframe["volume"] > 0)
-        ),
-        ["exit_short", "exit_tag"],
-    ] = 1, "Exit Short - SAR"
-
-    return dataframe
 
 
 if __name__ == "__main__":
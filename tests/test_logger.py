@@ -0,0 +1,20 @@
+import logging
+
+from utils.logger import Logger
+
+
+def test_debug_after_set_level_shows_caller(capsys):
+    logger = Logger("test_set_level", level=logging.INFO)
+    logger.info("info message")
+    logger.setLevel(logging.DEBUG)
+    logger.debug("debug message")
+    # Flush the queued records to the console handler
+    logger._stop_listener()
+
+    lines = capsys.readouterr().out.splitlines()
+    assert len(lines) == 2
+    assert lines[0].endswith("[INFO] info message")
+    assert (
+        "[DEBUG] [test_logger.py:test_debug_after_set_level_shows_caller:" in lines[1]
+    )
+    assert lines[1].endswith("] debug message")
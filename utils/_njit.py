@@ -0,0 +1,16 @@
+# Numba is optional: without it `njit` is a no-op decorator and `prange` is `range`,
+# so the jitted kernels still run as plain (slower) Python.
+try:
+    from numba import njit, prange
+except ImportError:  # pragma: no cover
+    prange = range
+
+    def njit(*args, **kwargs):
+        # Used both as `@njit` and as `@njit(cache=True, ...)`
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+
+        def decorator(func):
+            return func
+
+        return decorator
@@ -1,18 +1,39 @@
 from datetime import datetime
+import atexit
 import logging
+from logging.handlers import QueueHandler, QueueListener
+import queue
 import sys
 import time
 import os
 
 
 class Formatter(logging.Formatter):
+    def __init__(self, fmt=None, debug_fmt=None, *args, **kwargs):
+        """
+        - fmt: str, the format of the records
+        - debug_fmt: str, optional, the format of the DEBUG (and lower) records
+        """
+        super().__init__(fmt, *args, **kwargs)
+        self._debug_style = logging.PercentStyle(debug_fmt) if debug_fmt else None
+        # (second, formatted second) of the last record, only reformatted when the second changes.
+        # Kept as one tuple so a thread never sees a second paired with another second's string.
+        self._cached_time = (-1, "")
+
     def formatTime(self, record, datefmt=None):
-        milliseconds = int(record.msecs)
-        formatted_time = (
-            time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(record.created))
-            + f".{milliseconds:03.0f}"
-        )
-        return formatted_time
+        second = int(record.created)
+        cached_second, formatted_second = self._cached_time
+        if second != cached_second:
+            formatted_second = time.strftime(
+                "%Y-%m-%d %H:%M:%S", time.localtime(second)
+            )
+            self._cached_time = (second, formatted_second)
+        return f"{formatted_second}.{int(record.msecs):03d}"
+
+    def formatMessage(self, record):
+        if self._debug_style is not None and record.levelno <= logging.DEBUG:
+            return self._debug_style.format(record)
+        return super().formatMessage(record)
 
 
 class Logger(logging.Logger):
@@ -27,26 +48,73 @@ class Logger(logging.Logger):
         """
         super().__init__(name, level)
         self.setLevel(level)
+        # The caller location is only shown in the DEBUG records
         formatter = Formatter(
-            "[%(asctime)s] [%(levelname)s] [%(filename)s:%(funcName)s:%(lineno)s] %(message)s"
+            "[%(asctime)s] [%(levelname)s] %(message)s",
+            debug_fmt="[%(asctime)s] [%(levelname)s] [%(filename)s:%(funcName)s:%(lineno)s] %(message)s",
         )
+        # The handlers don't filter by level themselves, so a later `setLevel` on the logger
+        # also applies to them
+        handlers = []
         # Create handlers
         if log_file:
             # Generate log file name with datetime
             file_handler = logging.FileHandler(log_file)
             file_handler.setFormatter(formatter)
-            file_handler.setLevel(level)
-            self.addHandler(file_handler)
+            handlers.append(file_handler)
 
         # Console handler
         console_handler = logging.StreamHandler(sys.stdout)
         console_handler.setFormatter(formatter)
-        console_handler.setLevel(level)
-        self.addHandler(console_handler)
+        handlers.append(console_handler)
+
+        # The logging calls only push the records to a queue, a background thread
+        # formats and writes them to the handlers
+        self.queue_handler = QueueHandler(queue.SimpleQueue())
+        self.addHandler(self.queue_handler)
+        self.listener = QueueListener(
+            self.queue_handler.queue, *handlers, respect_handler_level=True
+        )
+        self.listener.start()
+        # Flush the queued records on exit
+        atexit.register(self._stop_listener)
+        # A forked child process (e.g. a ProcessPoolExecutor worker) has no listener thread,
+        # it writes to the handlers directly
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._use_handlers_directly)
 
         # Ensure the logger doesn't propagate to parent loggers
         self.propagate = False
 
+    def setLevel(self, level):
+        super().setLevel(level)
+        # `logging.getLogger` loggers get their `isEnabledFor` cache cleared by the manager,
+        # this logger isn't registered there so it clears its own
+        self._cache.clear()
+
+    def findCaller(self, stack_info=False, stacklevel=1):
+        # Walking the stack for the caller location is only worth it when DEBUG records,
+        # the only ones showing it, are logged or a stack trace is asked for
+        # (not `isEnabledFor`, its cache isn't cleared by `setLevel` for a logger outside
+        # `logging.getLogger`, a later switch to DEBUG would be missed)
+        if not stack_info and self.getEffectiveLevel() > logging.DEBUG:
+            return "(unknown file)", 0, "(unknown function)", None
+        # One more level to skip this override's frame
+        return super().findCaller(stack_info, stacklevel + 1)
+
+    def _stop_listener(self):
+        # QueueListener.stop fails when called twice, it may already have been stopped
+        if self.listener._thread is not None:
+            self.listener.stop()
+
+    def _use_handlers_directly(self):
+        self.removeHandler(self.queue_handler)
+        # The listener thread isn't running in this process, there is nothing to stop
+        self.listener._thread = None
+        for handler in self.listener.handlers:
+            self.addHandler(handler)
+
+
 if not os.path.exists("./logs"):
     os.makedirs("./logs")
 log_file_path = f"./logs/trading_{datetime.now().strftime('%Y-%m-%d')}.log"
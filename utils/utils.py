@@ -1,27 +1,73 @@
+import hashlib
+import inspect
+import os
 import time
+from collections.abc import Sequence
+from functools import wraps
+from typing import Iterator
 
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+from pyarrow import feather
 
+from utils._njit import njit, prange
 
-def load_dataframe(file_path: str) -> pd.DataFrame:
+OHLCV_COLUMNS = ("open", "high", "low", "close", "volume")
+
+
+def load_dataframe(
+    file_path: str, dtype=np.float32, columns=("date",) + OHLCV_COLUMNS
+) -> pd.DataFrame:
     """
     Load a DataFrame from a CSV or Feather file.
 
     Parameters:
     - file_path: str, path to the CSV or Feather file
+    - dtype: the dtype of the OHLCV columns (default is np.float32, half the memory of float64),
+      None keeps the dtypes of the file
+    - columns: the columns to load from a Feather file (default is date and OHLCV), None loads
+      all of them. CSV files are always loaded whole.
 
     Returns:
     - pd.DataFrame: Loaded DataFrame
     """
     if file_path.endswith(".csv"):
-        return pd.read_csv(file_path)
-    elif file_path.endswith(".feather"):
-        return pd.read_feather(file_path)
-    else:
+        # CSV headers vary (e.g. "Date,Open,..."), all the columns are loaded
+        df = pd.read_csv(file_path)
+        if dtype is not None:
+            df = df.astype({column: dtype for column in OHLCV_COLUMNS if column in df})
+        return df
+
+    if not file_path.endswith(".feather"):
         raise ValueError(
             "Unsupported file format. Please provide a .csv or .feather file."
         )
 
+    # Memory map the file and only read the requested columns, the dtype cast is done
+    # by Arrow so no float64 intermediate DataFrame is built
+    table = feather.read_table(
+        file_path,
+        columns=list(columns) if columns is not None else None,
+        memory_map=True,
+    )
+    if dtype is not None:
+        arrow_type = pa.from_numpy_dtype(np.dtype(dtype))
+        table = table.cast(
+            pa.schema(
+                [
+                    (
+                        pa.field(field.name, arrow_type)
+                        if field.name in OHLCV_COLUMNS
+                        else field
+                    )
+                    for field in table.schema
+                ],
+                metadata=table.schema.metadata,
+            )
+        )
+    return table.to_pandas(self_destruct=True)
+
 
 def dataframe_date_to_date(
     df: pd.DataFrame,
@@ -45,33 +91,82 @@ def dataframe_date_to_date(
     - pd.DataFrame: A DataFrame filtered by the date range, including the additional rows if specified,
       with the index reset.
     """
-    # Ensure the date column is in datetime format
-    df[date_column] = pd.to_datetime(df[date_column])
+    # Ensure the date column is in datetime format, converted in place so the next call skips it
+    if not pd.api.types.is_datetime64_any_dtype(df[date_column]):
+        df[date_column] = pd.to_datetime(df[date_column])
 
-    # Sort the DataFrame by the date column to ensure proper ordering
-    df = df.sort_values(by=date_column)
+    # Only sort when needed, the data files are already ordered by date
+    if not df[date_column].is_monotonic_increasing:
+        df = df.sort_values(by=date_column)
 
-    # Find the index of the first row that matches the start date
-    start_index = df[df[date_column] >= start_date].index[0]
+    # Binary search both bounds in one call instead of scanning the column with boolean masks.
+    # Searching for one tick past the end date on the left side is the same as side="right".
+    dates = df[date_column]
+    bounds = np.array(
+        [_to_datetime64(start_date, dates), _to_datetime64(end_date, dates)],
+        dtype=dates.values.dtype,
+    )
+    bounds[1] += np.timedelta64(1)
+    start_index, end_index = np.searchsorted(dates.values, bounds, side="left")
 
-    # Calculate the adjusted start index, ensuring it's non-negative
+    # No row in the date range, the prepare rows alone would all be before it
+    if start_index >= end_index:
+        return df.iloc[:0].reset_index(drop=True)
+
+    # Include the additional rows before the start date, ensuring it's non-negative
     adjusted_start_index = max(0, start_index - prepare)
 
-    # Filter the DataFrame by the adjusted start index and end date
-    mask = (df[date_column] >= df.iloc[adjusted_start_index][date_column]) & (
-        df[date_column] <= end_date
-    )
-    filtered_df = df.loc[mask]
+    return df.iloc[adjusted_start_index:end_index].reset_index(drop=True)
 
-    # Reset the index
-    filtered_df.reset_index(drop=True, inplace=True)
 
-    return filtered_df
+def _to_datetime64(date, dates: pd.Series) -> np.datetime64:
+    """
+    Convert a date to a `np.datetime64` comparable with `dates.values`.
+    A naive date is taken in the timezone of `dates`, like pandas does when comparing.
+    """
+    timestamp = pd.Timestamp(date)
+    if timestamp.tz is None and dates.dt.tz is not None:
+        timestamp = timestamp.tz_localize(dates.dt.tz)
+    return timestamp.to_datetime64()
 
 
-def generate_sub_dataframes(dataframe: pd.DataFrame, length: int):
+class SubDataFrames(Sequence):
+    """
+    Lazy sequence of the sub-dataframes of `generate_sub_dataframes`.
+    Each sub-dataframe is an `.iloc` slice built on access, so no list of slices is held in memory.
     """
-    Generate a list of sub-dataframes from the original dataframe.
+
+    def __init__(self, dataframe: pd.DataFrame, length: int):
+        self.dataframe = dataframe
+        self.length = length
+
+    def __len__(self) -> int:
+        return len(self.dataframe) - self.length + 1
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("sub-dataframe index out of range")
+        return self.dataframe.iloc[index : index + self.length]
+
+    def to_numpy(self, columns=OHLCV_COLUMNS, dtype=None) -> np.ndarray:
+        """
+        Zero-copy array of all the windows of `columns`, with shape (len(self), length, len(columns)).
+        Only the copy of `columns` into one array is allocated, the windows are strided views of it.
+        """
+        values = self.dataframe[list(columns)].to_numpy(dtype=dtype)
+        windows = np.lib.stride_tricks.sliding_window_view(
+            values, window_shape=self.length, axis=0
+        )
+        return windows.transpose(0, 2, 1)
+
+
+def generate_sub_dataframes(dataframe: pd.DataFrame, length: int) -> SubDataFrames:
+    """
+    Generate the sub-dataframes of the original dataframe.
     Each sub-dataframe has the specified length and moves one index forward.
 
     Parameters:
@@ -79,24 +174,78 @@ def generate_sub_dataframes(dataframe: pd.DataFrame, length: int):
         length (int): The length of each sub-dataframe.
 
     Returns:
-        list: A list of sub-dataframes.
+        SubDataFrames: A lazy sequence of the sub-dataframes, each one is created when accessed.
     """
     if length > len(dataframe):
         raise ValueError(
             "Length of sub-dataframes cannot be greater than the length of the original dataframe."
         )
 
-    sub_dataframes = []
-    for start in range(len(dataframe) - length + 1):
-        sub_df = dataframe.iloc[start : start + length]
-        sub_dataframes.append(sub_df)
+    return SubDataFrames(dataframe, length)
+
+
+def iter_windows(
+    dataframe: pd.DataFrame, length: int, columns=OHLCV_COLUMNS, dtype=None
+) -> Iterator[np.ndarray]:
+    """
+    Iterate over the windows of `generate_sub_dataframes` as (length, len(columns)) arrays.
+    The windows are views of a single array, no DataFrame is created per window.
+
+    Parameters:
+        dataframe (pd.DataFrame): The original dataframe.
+        length (int): The length of each window.
+        columns: The columns of the windows (default is OHLCV).
+        dtype: The dtype of the windows (default is the dtype of the columns).
+
+    Yields:
+        np.ndarray: The windows, each one moves one row forward.
+    """
+    yield from generate_sub_dataframes(dataframe, length).to_numpy(columns, dtype)
+
+
+@njit(cache=True, parallel=True)
+def apply_per_window(windows: np.ndarray, kernel) -> np.ndarray:
+    """
+    Apply a Numba jitted `kernel(window) -> float` to each window of `windows`, in parallel.
+
+    Parameters:
+        windows (np.ndarray): The windows, e.g. `generate_sub_dataframes(...).to_numpy()`.
+        kernel (callable): A `@njit` function reducing a window to a float.
+
+    Returns:
+        np.ndarray: A float64 array with the kernel result of each window.
+    """
+    out = np.empty(windows.shape[0])
+    for i in prange(windows.shape[0]):
+        out[i] = kernel(windows[i])
+    return out
+
+
+def measure_time(func):
+    """
+    Decorator measuring the execution time of a function with `time.perf_counter_ns`.
+
+    Parameters:
+        func (callable): The function to measure.
+
+    Returns:
+        callable: The wrapped function, each call returns a (result, execution_time) tuple
+        with the execution time in seconds.
+    """
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        start_time = time.perf_counter_ns()
+        result = func(*args, **kwargs)
+        execution_time = (time.perf_counter_ns() - start_time) * 1e-9
+        return result, execution_time
 
-    return sub_dataframes
+    return wrapper
 
 
-def measure_time(func, *args, **kwargs):
+def measure_time_once(func, *args, **kwargs):
     """
-    Measure the execution time of a function.
+    Measure the execution time of a single function call.
 
     Parameters:
         func (callable): The function to measure.
@@ -105,10 +254,130 @@ def measure_time(func, *args, **kwargs):
 
     Returns:
         result: The result of the function call.
-        execution_time: Time taken to execute the function.
+        execution_time: Time taken to execute the function, in seconds.
+    """
+    return measure_time(func)(*args, **kwargs)
+
+
+def _hash_values(values) -> bytes:
+    """
+    Bytes of the values of a Series or an Index, for hashing.
+    Object and extension arrays (e.g. categoricals) are hashed element-wise by pandas,
+    the bytes of an object array would be the pointers of its elements.
+    """
+    array = values.values
+    if not isinstance(array, np.ndarray) or array.dtype == object:
+        array = pd.util.hash_pandas_object(values, index=False).to_numpy()
+    # `.values` keeps tz-aware dates as datetime64
+    return array.tobytes()
+
+
+def _code_fingerprint(code) -> bytes:
+    """
+    Bytes identifying the code of a function: its bytecode, names and constants,
+    including the ones of the nested functions.
+    """
+    parts = [code.co_code, repr(code.co_names).encode()]
+    for constant in code.co_consts:
+        if hasattr(constant, "co_code"):
+            parts.append(_code_fingerprint(constant))
+        else:
+            parts.append(repr(constant).encode())
+    return b"\0".join(parts)
+
+
+def _source_fingerprint(objects) -> bytes:
+    """
+    Bytes of the source files of the modules defining `objects` (modules, functions or jitted functions).
+    """
+    parts = []
+    paths = {inspect.getsourcefile(inspect.getmodule(obj)) for obj in objects}
+    # Code typed in an interactive session has no source file
+    for path in sorted(path for path in paths if path and os.path.isfile(path)):
+        with open(path, "rb") as file:
+            parts.append(file.read())
+    return b"\0".join(parts)
+
+
+def feather_cache(
+    directory: str, enabled: bool = True, dependencies=(), max_files: int = 16
+):
+    """
+    Decorator caching the DataFrame returned by `func(dataframe, *args, **kwargs)` as a Feather file.
+
+    The cache key is a blake2b hash of the function name and code, the source of its module and
+    of the modules of `dependencies`, the index and all the columns of the input DataFrame and
+    the other arguments, so a repeated run on the same input with the same code reads
+    `{directory}/{key}.feather` instead of recomputing.
+    Modules called by `func` but not listed in `dependencies` are not part of the key.
+
+    Parameters:
+    - directory: str, directory of the cache files, created if missing
+    - enabled: bool, when False `func` is returned unchanged (default is True)
+    - dependencies: the modules, or functions of the modules, `func` relies on
+    - max_files: int, the number of cache files kept, the least recently used ones are removed
+
+    Returns:
+    - the decorator
+    """
+
+    def decorator(func):
+        if not enabled:
+            return func
+
+        @wraps(func)
+        def wrapper(dataframe: pd.DataFrame, *args, **kwargs) -> pd.DataFrame:
+            digest = hashlib.blake2b(func.__qualname__.encode(), digest_size=16)
+            digest.update(_code_fingerprint(func.__code__))
+            # Read on each call, the sources may be edited between two calls
+            digest.update(_source_fingerprint((func,) + tuple(dependencies)))
+            digest.update(repr((args, sorted(kwargs.items()))).encode())
+            digest.update(_hash_values(dataframe.index))
+            for column in dataframe.columns:
+                digest.update(repr(column).encode())
+                digest.update(str(dataframe[column].dtype).encode())
+                digest.update(_hash_values(dataframe[column]))
+            path = os.path.join(directory, f"{digest.hexdigest()}.feather")
+
+            if os.path.exists(path):
+                result = pd.read_feather(path)
+                # Mark the file as recently used for the pruning below
+                os.utime(path)
+                # Arrow reads the missing values of object columns back as None,
+                # restore the NaN of a fresh run
+                for column in result.columns[result.dtypes == object]:
+                    result[column] = result[column].where(
+                        result[column].notna(), np.nan
+                    )
+                return result
+
+            result = func(dataframe, *args, **kwargs)
+            os.makedirs(directory, exist_ok=True)
+            # Write to a temporary file first, so a concurrent run never reads a partial file
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            feather.write_feather(result, tmp_path, compression="uncompressed")
+            os.replace(tmp_path, path)
+            _prune_cache(directory, max_files)
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+def _prune_cache(directory: str, max_files: int):
+    """
+    Remove the least recently used Feather files of `directory` beyond `max_files`.
     """
-    start_time = time.time()
-    result = func(*args, **kwargs)
-    end_time = time.time()
-    execution_time = end_time - start_time
-    return result, execution_time
+    paths = [
+        os.path.join(directory, name)
+        for name in os.listdir(directory)
+        if name.endswith(".feather")
+    ]
+    paths.sort(key=os.path.getmtime, reverse=True)
+    for path in paths[max_files:]:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            # Already removed by a concurrent run
+            pass